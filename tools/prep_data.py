@@ -6,208 +6,411 @@ Creates sample datasets for testing the hierarchical reasoning model
 
 import argparse
 import json
-import random
 import numpy as np
-from typing import List, Dict, Any
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 import os
 
-def create_simple_reasoning_dataset(num_samples: int = 100) -> List[Dict[str, Any]]:
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Random draws are made in NumPy batches of this many samples, which keeps the
+# generators streaming while moving the per-sample RNG calls into C
+CHUNK_SIZE = 4096
+
+# Buffer size for dataset files; line-sized reads and writes of JSON Lines
+# otherwise turn into a syscall every 8KB
+IO_BUFFER_SIZE = 1 << 20
+
+SEQUENCE_TYPES = ("arithmetic", "geometric", "fibonacci", "pattern")
+
+# Inclusive ranges of the (start, step, length) parameters for each sequence type
+SEQUENCE_PARAM_LOW = np.array([[1, 1, 5], [1, 2, 4], [1, 1, 6], [1, 1, 6]])
+SEQUENCE_PARAM_HIGH = np.array([[10, 5, 8], [5, 3, 6], [1, 1, 8], [5, 1, 6]])
+
+# Columns of the per-chunk term matrix: the longest sequence plus its next term
+SEQUENCE_WIDTH = int(SEQUENCE_PARAM_HIGH[:, 2].max()) + 1
+
+def _chunks(num_samples: int) -> Iterator[Tuple[int, int]]:
+    """Yield (offset, size) pairs covering num_samples in CHUNK_SIZE batches"""
+    
+    for offset in range(0, num_samples, CHUNK_SIZE):
+        yield offset, min(CHUNK_SIZE, num_samples - offset)
+
+# Sequence kernels fill a whole chunk per call: row i holds the first `width`
+# terms of sample i, so its sequence is row[:length] and its target row[length].
+# Type ids index SEQUENCE_TYPES (arithmetic, geometric, fibonacci, pattern).
+if njit is not None:
+    @njit(cache=True)
+    def _sequence_terms(type_ids, params, width):
+        """Compute the term matrix for a chunk of sequence samples"""
+        out = np.empty((type_ids.shape[0], width), np.int64)
+        for i in range(type_ids.shape[0]):
+            start = params[i, 0]
+            step = params[i, 1]
+            if type_ids[i] == 0:
+                for k in range(width):
+                    out[i, k] = start + k * step
+            elif type_ids[i] == 1:
+                value = start
+                for k in range(width):
+                    out[i, k] = value
+                    value *= step
+            elif type_ids[i] == 2:
+                out[i, 0] = 1
+                out[i, 1] = 1
+                for k in range(2, width):
+                    out[i, k] = out[i, k - 1] + out[i, k - 2]
+            else:
+                for k in range(width):
+                    out[i, k] = start * (1 + k % 2)
+        return out
+else:
+    def _sequence_terms(type_ids, params, width):
+        """Vectorized NumPy equivalent of the numba kernel"""
+        k = np.arange(width)
+        start = params[:, 0:1]
+        step = params[:, 1:2]
+        fibonacci = np.ones(width, np.int64)
+        for j in range(2, width):
+            fibonacci[j] = fibonacci[j - 1] + fibonacci[j - 2]
+        type_ids = type_ids[:, None]
+        return np.select(
+            [type_ids == 0, type_ids == 1, type_ids == 2],
+            [start + k * step, start * step ** k, np.broadcast_to(fibonacci, (len(type_ids), width))],
+            start * (1 + k % 2),
+        )
+
+def create_simple_reasoning_dataset(num_samples: int = 100) -> Iterator[Dict[str, Any]]:
     """
-    Create a simple multi-hop reasoning dataset
+    Generate a simple multi-hop reasoning dataset
     Each sample requires the model to perform multiple reasoning steps
     """
     
-    samples = []
+    difficulty_labels = ("easy", "medium", "hard")
+    rng = np.random.default_rng()
     
-    for i in range(num_samples):
-        # Create a simple arithmetic reasoning chain
+    for offset, n in _chunks(num_samples):
+        # Create simple arithmetic reasoning chains
         # Example: "If x = 3 and y = x + 2, what is y * 2?"
+        xs = rng.integers(1, 11, n)
+        dys = rng.integers(1, 6, n)
+        mults = rng.integers(2, 5, n)
+        ys = xs + dys
+        zs = ys * mults
+        targets = zs.tolist()
         
-        x = random.randint(1, 10)
-        y = x + random.randint(1, 5)
-        z = y * random.randint(2, 4)
-        
-        # Multi-step reasoning problem
-        problem = f"Given x = {x}, and y = x + {y - x}, what is y * {z // y}?"
+        # Classify all targets at once: < 50 easy, < 100 medium, otherwise hard
+        difficulties = np.digitize(zs, [50, 100]).tolist()
         
-        # Break down into steps for hierarchical reasoning
-        steps = [
-            f"Step 1: x = {x}",
-            f"Step 2: y = x + {y - x} = {x} + {y - x} = {y}",
-            f"Step 3: y * {z // y} = {y} * {z // y} = {z}"
-        ]
+        # Convert every number to text up front; the f-strings below then
+        # only join ready-made strings
+        xs, dys, mults, ys, zs = (list(map(str, a.tolist())) for a in (xs, dys, mults, ys, zs))
         
-        sample = {
-            "id": f"reasoning_{i:04d}",
-            "input": problem,
-            "steps": steps,
-            "target": z,
-            "difficulty": "easy" if z < 50 else "medium" if z < 100 else "hard"
-        }
-        
-        samples.append(sample)
+        for j in range(n):
+            i = offset + j
+            x = xs[j]
+            dy = dys[j]
+            mult = mults[j]
+            y = ys[j]
+            z = zs[j]
+            target = targets[j]
+            difficulty = difficulty_labels[difficulties[j]]
+            
+            # Multi-step reasoning problem
+            problem = f"Given x = {x}, and y = x + {dy}, what is y * {mult}?"
+            
+            # Break down into steps for hierarchical reasoning
+            steps = [
+                f"Step 1: x = {x}",
+                f"Step 2: y = x + {dy} = {x} + {dy} = {y}",
+                f"Step 3: y * {mult} = {y} * {mult} = {z}"
+            ]
+            
+            sample = {
+                "id": f"reasoning_{i:04d}",
+                "input": problem,
+                "steps": steps,
+                "target": target,
+                "difficulty": difficulty
+            }
+            
+            yield sample
+
+# Simple pre-made Sudoku puzzles for testing
+# These are valid but simple puzzles
+SUDOKU_PUZZLES = [
+    # Easy puzzle 1
+    "530070000600195000098000060800060003400803001700020006060000280000419005000080079",
+    # Easy puzzle 2  
+    "200080300060070084030500209000105408000000000402706000301007040720040060004010003",
+    # Medium puzzle
+    "000000907000420180000705026100904000050000040000507009920108000034059000507000000"
+]
+
+SUDOKU_SOLUTIONS = [
+    "534678912672195348198342567859761423426853791713924856961537284287419635345286179",
+    "245981376169273584837564219976125438513498627482736951351827945728349165694615832", 
+    "218643957967428185543715826176924538852316743394587269925178364634259871587361492"
+]
+
+def sudoku_template_array() -> np.ndarray:
+    """Return the template puzzles and solutions as a (T, 2, 81) uint8 array"""
+    
+    # Convert digit strings to integers via ASCII subtraction in NumPy
+    digits = ''.join(p + s for p, s in zip(SUDOKU_PUZZLES, SUDOKU_SOLUTIONS))
+    return (np.frombuffer(digits.encode('ascii'), dtype=np.uint8) - ord('0')).reshape(-1, 2, 81)
+
+def _sudoku_metadata(num_samples: int) -> Iterator[Dict[str, Any]]:
+    """Yield the id and a random difficulty for each Sudoku sample"""
     
-    return samples
+    difficulty_labels = ("easy", "medium")
+    rng = np.random.default_rng()
+    
+    for offset, n in _chunks(num_samples):
+        difficulties = rng.integers(0, len(difficulty_labels), n).tolist()
+        
+        for j in range(n):
+            yield {"id": f"sudoku_{offset + j:04d}", "difficulty": difficulty_labels[difficulties[j]]}
 
-def create_sudoku_test_dataset(num_samples: int = 50) -> List[Dict[str, Any]]:
+def create_sudoku_test_dataset(num_samples: int = 50) -> Iterator[Dict[str, Any]]:
     """
-    Create a small Sudoku test dataset
+    Generate a small Sudoku test dataset
     Each puzzle is represented as a sequence of 81 numbers (0 for blanks, 1-9 for digits)
     """
     
-    # Simple pre-made Sudoku puzzles for testing
-    # These are valid but simple puzzles
-    sample_puzzles = [
-        # Easy puzzle 1
-        "530070000600195000098000060800060003400803001700020006060000280000419005000080079",
-        # Easy puzzle 2  
-        "200080300060070084030500209000105408000000000402706000301007040720040060004010003",
-        # Medium puzzle
-        "000000907000420180000705026100904000050000040000507009920108000034059000507000000"
-    ]
-    
-    sample_solutions = [
-        "534678912672195348198342567859761423426853791713924856961537284287419635345286179",
-        "245981376169273584837564219976125438513498627482736951351827945728349165694615832", 
-        "218643957967428185543715826176924538852316743394587269925178364634259871587361492"
-    ]
-    
-    samples = []
-    
-    for i in range(num_samples):
+    # Build the template samples once. Puzzles are stored as tuples so every
+    # sample can share them safely.
+    templates = []
+    for puzzle, solution in sudoku_template_array().tolist():
+        templates.append({"puzzle": tuple(puzzle), "solution": tuple(solution), "blanks": puzzle.count(0)})
+    
+    for i, meta in enumerate(_sudoku_metadata(num_samples)):
         # Cycle through the sample puzzles
-        puzzle_idx = i % len(sample_puzzles)
-        puzzle_str = sample_puzzles[puzzle_idx]
-        solution_str = sample_solutions[puzzle_idx]
-        
-        # Convert to lists of integers
-        puzzle = [int(c) for c in puzzle_str]
-        solution = [int(c) for c in solution_str]
+        sample = {**meta, **templates[i % len(templates)]}
         
-        sample = {
-            "id": f"sudoku_{i:04d}",
-            "puzzle": puzzle,
-            "solution": solution,
-            "difficulty": random.choice(["easy", "medium"]),
-            "blanks": puzzle.count(0)
-        }
-        
-        samples.append(sample)
+        yield sample
+
+def create_sudoku_array_dataset(num_samples: int = 50) -> Tuple[np.ndarray, Iterator[Dict[str, Any]]]:
+    """
+    Generate the Sudoku test dataset in native array form
+    Returns an (N, 2, 81) uint8 array of puzzles and solutions together with
+    the per-sample metadata (id, difficulty) to be stored alongside it
+    """
+    
+    templates = sudoku_template_array()
     
-    return samples
+    # Cycle through the sample puzzles with a single gather
+    arr = templates[np.arange(num_samples) % len(templates)]
+    
+    return arr, _sudoku_metadata(num_samples)
 
-def create_sequence_completion_dataset(num_samples: int = 100) -> List[Dict[str, Any]]:
+def sudoku_metadata_path(array_path: str) -> str:
+    """Return the JSON Lines sidecar path for a Sudoku .npy dataset"""
+    
+    # Same naming rule as load_sudoku_arrays in test_dataset.py; keep them in sync
+    return os.path.splitext(array_path)[0] + '.meta.jsonl'
+
+def create_sequence_completion_dataset(num_samples: int = 100) -> Iterator[Dict[str, Any]]:
     """
-    Create a sequence completion dataset for testing adaptive computation
+    Generate a sequence completion dataset for testing adaptive computation
     """
     
-    samples = []
+    difficulty_labels = ("easy", "medium")
+    rng = np.random.default_rng()
     
-    for i in range(num_samples):
-        # Create different types of sequences
-        seq_type = random.choice(["arithmetic", "geometric", "fibonacci", "pattern"])
+    for offset, n in _chunks(num_samples):
+        # Create different types of sequences, drawing each sample's
+        # (start, step, length) from the ranges for its type
+        type_ids = rng.integers(0, len(SEQUENCE_TYPES), n)
+        params = rng.integers(SEQUENCE_PARAM_LOW[type_ids], SEQUENCE_PARAM_HIGH[type_ids],
+                              endpoint=True)
         
-        if seq_type == "arithmetic":
-            start = random.randint(1, 10)
-            diff = random.randint(1, 5)
-            length = random.randint(5, 8)
-            sequence = [start + i * diff for i in range(length)]
-            next_val = start + length * diff
-            
-        elif seq_type == "geometric":
-            start = random.randint(1, 5)
-            ratio = random.randint(2, 3)
-            length = random.randint(4, 6)
-            sequence = [start * (ratio ** i) for i in range(length)]
-            next_val = start * (ratio ** length)
-            
-        elif seq_type == "fibonacci":
-            sequence = [1, 1]
-            length = random.randint(6, 8)
-            for j in range(2, length):
-                sequence.append(sequence[j-1] + sequence[j-2])
-            next_val = sequence[-1] + sequence[-2]
-            
-        else:  # pattern
-            base = random.randint(1, 5)
-            sequence = [base, base*2, base, base*2, base, base*2]
-            next_val = base
+        # Build every sequence in the chunk with one kernel call
+        terms = _sequence_terms(type_ids, params, SEQUENCE_WIDTH).tolist()
         
-        sample = {
-            "id": f"sequence_{i:04d}",
-            "sequence": sequence,
-            "target": next_val,
-            "type": seq_type,
-            "difficulty": "easy" if len(sequence) <= 5 else "medium"
-        }
+        # Sequences of up to 5 terms are easy, longer ones medium
+        lengths = params[:, 2]
+        difficulties = np.where(lengths <= 5, 0, 1).tolist()
+        lengths = lengths.tolist()
+        type_ids = type_ids.tolist()
         
-        samples.append(sample)
+        for j in range(n):
+            i = offset + j
+            row = terms[j]
+            length = lengths[j]
+            
+            sample = {
+                "id": f"sequence_{i:04d}",
+                "sequence": row[:length],
+                "target": row[length],
+                "type": SEQUENCE_TYPES[type_ids[j]],
+                "difficulty": difficulty_labels[difficulties[j]]
+            }
+            
+            yield sample
+
+def _dumps(sample: Dict[str, Any], pretty: bool = False) -> bytes:
+    """Serialize a single sample to compact JSON (indented if pretty)"""
+    
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(sample, option=option)
+    if pretty:
+        return json.dumps(sample, indent=2).encode()
+    return json.dumps(sample, separators=(',', ':')).encode()
+
+def interleave_datasets(sources: List[Tuple[Iterable[Dict[str, Any]], int]]) -> Iterator[Dict[str, Any]]:
+    """
+    Randomly interleave several sample streams without materializing them
+    The order is a NumPy permutation of one uint8 stream label per sample,
+    which is equivalent to shuffling the concatenated lists
+    """
+    
+    iterators = [iter(source) for source, _ in sources]
+    labels = np.repeat(np.arange(len(iterators), dtype=np.uint8), [count for _, count in sources])
+    order = np.random.default_rng().permutation(labels)
+    
+    for offset, n in _chunks(len(order)):
+        for k in order[offset:offset + n].tolist():
+            yield next(iterators[k])
+
+def tally(data: Iterable[Dict[str, Any]], difficulties: Counter, head: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Pass samples through, recording the first one and the difficulty histogram"""
+    
+    for sample in data:
+        if not head:
+            head.append(sample)
+        if 'difficulty' in sample:
+            difficulties[sample['difficulty']] += 1
+        yield sample
+
+def _is_json_array(f) -> bool:
+    """Tell a single JSON array from JSON Lines by the first non-whitespace byte"""
+    
+    return f.peek(IO_BUFFER_SIZE).lstrip()[:1] == b'['
+
+def load_samples(input_path: str) -> Iterator[Dict[str, Any]]:
+    """Stream samples from a JSON Lines file (or a file holding one JSON array)"""
+    
+    loads = orjson.loads if orjson is not None else json.loads
     
-    return samples
+    with open(input_path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        if _is_json_array(f):
+            yield from loads(f.read())
+        else:
+            for line in f:
+                if line.strip():
+                    yield loads(line)
 
-def save_dataset(data: List[Dict[str, Any]], output_path: str):
-    """Save dataset to JSON file"""
+def save_dataset(data: Iterable[Dict[str, Any]], output_path: str, pretty: bool = False) -> int:
+    """
+    Stream dataset samples to a JSON Lines file (one sample per line)
+    With pretty=True, write an indented JSON array for human inspection instead
+    """
     
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    count = 0
+    with open(output_path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        if pretty:
+            f.write(b'[')
+            for sample in data:
+                f.write(b',\n' if count else b'\n')
+                f.write(_dumps(sample, pretty=True))
+                count += 1
+            f.write(b'\n]\n')
+        else:
+            for sample in data:
+                f.write(_dumps(sample))
+                f.write(b'\n')
+                count += 1
     
-    print(f"✅ Saved {len(data)} samples to {output_path}")
+    print(f"✅ Saved {count} samples to {output_path}")
+    return count
 
 def main():
     parser = argparse.ArgumentParser(description="Create test datasets for HRM-MLX")
     parser.add_argument("--input", type=str, 
                        help="Input dataset file (optional, for processing existing data)")
-    parser.add_argument("--output", type=str, default="data/processed/sample_processed.json", 
-                       help="Output path for the dataset")
+    parser.add_argument("--output", type=str, default="data/processed/sample_processed.jsonl", 
+                       help="Output path for the dataset (.npy stores Sudoku puzzles as a uint8 array)")
     parser.add_argument("--type", type=str, choices=["reasoning", "sudoku", "sequence", "all"], 
                        default="reasoning", help="Type of dataset to create")
     parser.add_argument("--num_samples", type=int, default=100, 
                        help="Number of samples to generate")
+    parser.add_argument("--pretty", action="store_true",
+                       help="Write an indented JSON array for human inspection instead of JSON Lines")
     
     args = parser.parse_args()
     
+    if args.pretty and args.output.endswith('.npy'):
+        parser.error("--pretty cannot be used with a .npy --output; its metadata sidecar is always JSON Lines")
+    copying_input = bool(args.input) and os.path.exists(args.input)
+    if args.output.endswith('.npy') and (args.type != "sudoku" or copying_input):
+        parser.error("a .npy --output is only supported when generating --type sudoku")
+    
     print(f"🔧 Creating {args.type} dataset with {args.num_samples} samples...")
     
+    output_path = args.output
+    
     # If input file is provided, load and process it
     if args.input and os.path.exists(args.input):
         print(f"📂 Loading existing data from {args.input}")
-        with open(args.input, 'r') as f:
-            existing_data = json.load(f)
+        existing_data = load_samples(args.input)
         
         # Process existing data (for now, just copy it)
         data = existing_data
-        print(f"📋 Loaded {len(data)} existing samples")
+        if os.path.abspath(args.input) == os.path.abspath(args.output):
+            # Reading and writing the same file cannot be streamed
+            data = list(data)
     else:
         # Generate new data
         if args.type == "reasoning":
             data = create_simple_reasoning_dataset(args.num_samples)
+        elif args.type == "sudoku" and output_path.endswith('.npy'):
+            # Store puzzles as a raw uint8 array with a small metadata sidecar
+            arr, data = create_sudoku_array_dataset(args.num_samples)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            np.save(output_path, arr)
+            print(f"✅ Saved {arr.shape[0]} puzzles to {output_path}")
+            output_path = sudoku_metadata_path(output_path)
         elif args.type == "sudoku":
             data = create_sudoku_test_dataset(args.num_samples)
         elif args.type == "sequence":
             data = create_sequence_completion_dataset(args.num_samples)
         elif args.type == "all":
             # Create a mixed dataset
-            reasoning_data = create_simple_reasoning_dataset(args.num_samples // 3)
-            sudoku_data = create_sudoku_test_dataset(args.num_samples // 3)
-            sequence_data = create_sequence_completion_dataset(args.num_samples // 3)
-            data = reasoning_data + sudoku_data + sequence_data
-            random.shuffle(data)
+            n = args.num_samples // 3
+            data = interleave_datasets([
+                (create_simple_reasoning_dataset(n), n),
+                (create_sudoku_test_dataset(n), n),
+                (create_sequence_completion_dataset(n), n),
+            ])
+    
+    difficulties = Counter()
+    head = []
+    total = save_dataset(tally(data, difficulties, head), output_path, pretty=args.pretty)
     
-    save_dataset(data, args.output)
+    if not head:
+        return
     
     # Print sample
     print(f"\n📋 Sample data:")
-    print(json.dumps(data[0], indent=2))
+    print(json.dumps(head[0], indent=2))
     
     print(f"\n📊 Dataset summary:")
-    print(f"  Total samples: {len(data)}")
-    if 'difficulty' in data[0]:
-        difficulties = [sample['difficulty'] for sample in data]
-        for diff in set(difficulties):
-            print(f"  {diff.capitalize()}: {difficulties.count(diff)} samples")
+    print(f"  Total samples: {total}")
+    for diff, count in difficulties.items():
+        print(f"  {diff.capitalize()}: {count} samples")
 
 if __name__ == "__main__":
     main()
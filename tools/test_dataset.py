@@ -7,21 +7,115 @@ Demonstrates how to load and use test datasets
 import json
 import argparse
 import os
-from typing import List, Dict, Any
+import numpy as np
+from collections import Counter
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Keys every sample of a given type must carry
+REASONING_KEYS = frozenset(['id', 'input', 'target'])
+SEQUENCE_KEYS = frozenset(['id', 'sequence', 'target'])
+SUDOKU_KEYS = frozenset(['id', 'puzzle', 'solution'])
+
+# Read buffer size for dataset files; iterating JSON Lines with the default
+# buffer would issue a read syscall every 8KB
+IO_BUFFER_SIZE = 1 << 20
+
+def _is_json_array(f) -> bool:
+    """Tell a single JSON array from JSON Lines by the first non-whitespace byte"""
+    
+    return f.peek(IO_BUFFER_SIZE).lstrip()[:1] == b'['
 
 def load_dataset(file_path: str) -> List[Dict[str, Any]]:
-    """Load dataset from JSON file"""
+    """Load dataset from a JSON Lines file (or a file holding one JSON array)"""
     
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Dataset file not found: {file_path}")
     
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+    if file_path.endswith('.npy'):
+        data = load_sudoku_arrays(file_path)
+        print(f"📊 Loaded {len(data)} samples from {file_path}")
+        return data
+    
+    loads = orjson.loads if orjson is not None else json.loads
+    
+    with open(file_path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        if _is_json_array(f):
+            data = loads(f.read())
+        else:
+            data = [loads(line) for line in f if line.strip()]
     
     print(f"📊 Loaded {len(data)} samples from {file_path}")
     return data
 
-def analyze_dataset(data: List[Dict[str, Any]]):
+class SudokuArrays(list):
+    """Sample dicts loaded from a .npy Sudoku dataset, plus the (N, 2, 81) array they view"""
+    
+    def __init__(self, samples: List[Dict[str, Any]], arrays: np.ndarray):
+        super().__init__(samples)
+        self.arrays = arrays
+
+def load_sudoku_arrays(file_path: str) -> SudokuArrays:
+    """
+    Load a Sudoku dataset stored as an (N, 2, 81) uint8 array plus metadata sidecar
+    Puzzles and solutions are views into the loaded array, not copies
+    """
+    
+    # Same naming rule as sudoku_metadata_path in prep_data.py; keep them in sync
+    meta_path = os.path.splitext(file_path)[0] + '.meta.jsonl'
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"Sudoku metadata file not found: {meta_path}")
+    
+    arr = np.load(file_path)
+    if arr.ndim != 3 or arr.shape[1:] != (2, 81):
+        raise ValueError(f"Expected an (N, 2, 81) array in {file_path}, got {arr.shape}")
+    blanks = np.count_nonzero(arr[:, 0] == 0, axis=1).tolist()
+    
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(meta_path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        meta = [loads(line) for line in f if line.strip()]
+    
+    if len(meta) != len(arr):
+        raise ValueError(f"Metadata has {len(meta)} entries but {file_path} has {len(arr)} puzzles")
+    
+    samples = [
+        {**m, "puzzle": arr[i, 0], "solution": arr[i, 1], "blanks": blanks[i]}
+        for i, m in enumerate(meta)
+    ]
+    return SudokuArrays(samples, arr)
+
+def detect_sample_type(sample: Dict[str, Any]) -> str:
+    """Classify a sample by the keys it carries"""
+    
+    if 'puzzle' in sample:
+        return 'sudoku'
+    elif 'sequence' in sample:
+        return 'sequence'
+    elif 'steps' in sample:
+        return 'reasoning'
+    return 'unknown'
+
+def scan_dataset(data: List[Dict[str, Any]]) -> Tuple[Counter, Dict[str, List[int]]]:
+    """
+    Walk the dataset once, counting difficulties and grouping sample indices by type
+    Analysis and validation both work from the result of this single pass
+    """
+    
+    difficulties = Counter()
+    buckets = {}
+    
+    for i, sample in enumerate(data):
+        buckets.setdefault(detect_sample_type(sample), []).append(i)
+        difficulties[sample.get('difficulty', 'unknown')] += 1
+    
+    return difficulties, buckets
+
+def analyze_dataset(data: List[Dict[str, Any]], difficulties: Counter, buckets: Dict[str, List[int]]):
     """Analyze dataset structure and content"""
     
     print("\n🔍 Dataset Analysis:")
@@ -33,28 +127,10 @@ def analyze_dataset(data: List[Dict[str, Any]]):
     # Check data types
     sample_keys = set(data[0].keys())
     print(f"  Sample keys: {sample_keys}")
-    
-    # Check for different data types
-    data_types = set()
-    for sample in data:
-        if 'puzzle' in sample:
-            data_types.add('sudoku')
-        elif 'sequence' in sample:
-            data_types.add('sequence')
-        elif 'steps' in sample:
-            data_types.add('reasoning')
-        else:
-            data_types.add('unknown')
-    
-    print(f"  Data types: {data_types}")
+    print(f"  Data types: {set(buckets)}")
     
     # Check difficulties if available
     if 'difficulty' in data[0]:
-        difficulties = {}
-        for sample in data:
-            diff = sample.get('difficulty', 'unknown')
-            difficulties[diff] = difficulties.get(diff, 0) + 1
-        
         print(f"  Difficulty distribution:")
         for diff, count in difficulties.items():
             print(f"    {diff}: {count} samples")
@@ -70,6 +146,17 @@ def validate_reasoning_sample(sample: Dict[str, Any]) -> bool:
     
     return True
 
+def validate_sequence_sample(sample: Dict[str, Any]) -> bool:
+    """Validate a sequence completion sample"""
+    
+    required_keys = ['id', 'sequence', 'target']
+    for key in required_keys:
+        if key not in sample:
+            print(f"❌ Missing key '{key}' in sample {sample.get('id', 'unknown')}")
+            return False
+    
+    return True
+
 def validate_sudoku_sample(sample: Dict[str, Any]) -> bool:
     """Validate a Sudoku sample"""
     
@@ -104,35 +191,96 @@ def validate_sudoku_sample(sample: Dict[str, Any]) -> bool:
     
     return True
 
-def validate_dataset(data: List[Dict[str, Any]]):
-    """Validate dataset samples"""
+def sudoku_rows_in_range(puzzles: np.ndarray, solutions: np.ndarray) -> np.ndarray:
+    """Per-row check that puzzle cells are 0-9 and solution cells are 1-9"""
+    
+    return (((puzzles >= 0) & (puzzles <= 9)).all(axis=1) &
+            ((solutions >= 1) & (solutions <= 9)).all(axis=1))
+
+def validate_sudoku_batch(samples: List[Dict[str, Any]], arrays: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Check Sudoku samples together with vectorized NumPy checks
+    Returns a boolean mask of samples that pass; the rest are left for
+    validate_sudoku_sample, which reports why (ragged or non-numeric rows
+    are only checked there). Samples loaded from .npy pass their
+    (N, 2, 81) array, which is checked in place
+    """
+    
+    passed = np.zeros(len(samples), dtype=bool)
+    keyed = [k for k, sample in enumerate(samples) if SUDOKU_KEYS <= sample.keys()]
+    
+    if arrays is not None:
+        # A full slice keeps the check on views rather than fancy-indexed copies
+        rows = slice(None) if len(keyed) == len(samples) else keyed
+        passed[rows] = sudoku_rows_in_range(arrays[rows, 0], arrays[rows, 1])
+    elif keyed:
+        try:
+            puzzles = np.asarray([samples[k]['puzzle'] for k in keyed], dtype=np.int8)
+            solutions = np.asarray([samples[k]['solution'] for k in keyed], dtype=np.int8)
+            if puzzles.shape[1:] == (81,) and solutions.shape[1:] == (81,):
+                passed[keyed] = sudoku_rows_in_range(puzzles, solutions)
+        except (ValueError, TypeError, OverflowError):
+            # Ragged, non-numeric or out-of-int8-range rows are left for the per-sample check
+            pass
+    
+    return passed
+
+def validate_reasoning_batch(samples: List[Dict[str, Any]]) -> np.ndarray:
+    """Check reasoning samples together; returns a mask of samples that pass"""
+    
+    return np.fromiter((REASONING_KEYS <= sample.keys() for sample in samples),
+                       dtype=bool, count=len(samples))
+
+def validate_sequence_batch(samples: List[Dict[str, Any]]) -> np.ndarray:
+    """Check sequence samples together; returns a mask of samples that pass"""
+    
+    return np.fromiter((SEQUENCE_KEYS <= sample.keys() for sample in samples),
+                       dtype=bool, count=len(samples))
+
+# Per-sample validators, which print why a sample is invalid
+SAMPLE_VALIDATORS = {
+    'sudoku': validate_sudoku_sample,
+    'reasoning': validate_reasoning_sample,
+    'sequence': validate_sequence_sample,
+}
+
+# One batch validator per sample type, as grouped by scan_dataset
+BATCH_VALIDATORS = {
+    'sudoku': validate_sudoku_batch,
+    'reasoning': validate_reasoning_batch,
+    'sequence': validate_sequence_batch,
+}
+
+def validate_dataset(data: List[Dict[str, Any]], buckets: Dict[str, List[int]], fail_fast: bool = False):
+    """
+    Validate dataset samples, one sample type at a time
+    Samples that fail the batch checks are re-checked in file order to report
+    why; with fail_fast, stop at the first one that is really invalid
+    """
     
     print("\n✅ Validating dataset...")
     
-    valid_count = 0
+    # Samples of unknown type are not checked
+    valid = np.ones(len(data), dtype=bool)
     
-    for i, sample in enumerate(data):
-        is_valid = True
-        
-        # Determine sample type and validate accordingly
-        if 'puzzle' in sample:
-            is_valid = validate_sudoku_sample(sample)
-        elif 'steps' in sample:
-            is_valid = validate_reasoning_sample(sample)
-        elif 'sequence' in sample:
-            # Basic validation for sequence samples
-            required_keys = ['id', 'sequence', 'target']
-            for key in required_keys:
-                if key not in sample:
-                    print(f"❌ Missing key '{key}' in sample {sample.get('id', 'unknown')}")
-                    is_valid = False
-        
-        if is_valid:
-            valid_count += 1
-        else:
+    for sample_type, indices in buckets.items():
+        samples = [data[i] for i in indices]
+        if sample_type == 'sudoku' and isinstance(data, SudokuArrays):
+            # Every sample of a .npy dataset is Sudoku; check its array directly
+            valid[indices] = validate_sudoku_batch(samples, data.arrays)
+        elif sample_type in BATCH_VALIDATORS:
+            valid[indices] = BATCH_VALIDATORS[sample_type](samples)
+    
+    for i in np.flatnonzero(~valid).tolist():
+        sample = data[i]
+        valid[i] = SAMPLE_VALIDATORS[detect_sample_type(sample)](sample)
+        if not valid[i]:
             print(f"❌ Sample {i} is invalid")
+            if fail_fast:
+                print("⏹️  Stopping validation at the first invalid sample")
+                return
     
-    print(f"✅ {valid_count}/{len(data)} samples are valid")
+    print(f"✅ {np.count_nonzero(valid)}/{len(data)} samples are valid")
 
 def show_samples(data: List[Dict[str, Any]], num_samples: int = 3):
     """Show sample data"""
@@ -149,7 +297,10 @@ def show_samples(data: List[Dict[str, Any]], num_samples: int = 3):
             print(f"Type: Sudoku")
             print(f"Difficulty: {sample.get('difficulty', 'unknown')}")
             print(f"Blanks: {sample.get('blanks', 'unknown')}")
-            print("Puzzle (first 9 cells):", sample['puzzle'][:9])
+            # Read the cells in place rather than slicing out a copy; this
+            # works for JSON lists and for views into a loaded .npy array
+            first_cells = ", ".join(map(str, islice(sample['puzzle'], 9)))
+            print(f"Puzzle (first 9 cells): [{first_cells}]")
             
         elif 'steps' in sample:
             print(f"ID: {sample['id']}")
@@ -171,6 +322,8 @@ def main():
                        help="Input dataset file")
     parser.add_argument("--validate", action="store_true", 
                        help="Run validation checks")
+    parser.add_argument("--fail_fast", action="store_true",
+                       help="Stop validation at the first invalid sample")
     parser.add_argument("--show_samples", type=int, default=3,
                        help="Number of samples to display")
     
@@ -183,12 +336,15 @@ def main():
         # Load dataset
         data = load_dataset(args.input)
         
+        # Single pass shared by analysis and validation
+        difficulties, buckets = scan_dataset(data)
+        
         # Analyze dataset
-        analyze_dataset(data)
+        analyze_dataset(data, difficulties, buckets)
         
         # Validate if requested
         if args.validate:
-            validate_dataset(data)
+            validate_dataset(data, buckets, fail_fast=args.fail_fast)
         
         # Show samples
         if args.show_samples > 0: